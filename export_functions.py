@@ -0,0 +1,350 @@
+import argparse
+import io
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+
+from util_functions import *
+
+
+NEGOCIOS = ['sabimet', 'steelk']
+
+REPORTS = {
+    'detalle': 'Análisis Detallado',
+    'pv': 'Agregado por pv',
+    'crudo': 'Datos procesados',
+}
+
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+DEFAULT_CHUNKSIZE = 50000
+
+# Excel sheets hold at most 1,048,576 rows, header included
+EXCEL_MAX_ROWS = 1048576
+
+
+def resolve_period(year=None, month=None, desde=None, hasta=None):
+    """
+    Converts the export selection into 'Terminado' bounds.
+
+    A year and month select that month, desde/hasta select an inclusive date range,
+    and no arguments select the full history.
+
+    :return: tuple (start, end), start inclusive and end exclusive, either may be None
+    """
+    if year is not None and month is not None:
+        start = datetime(year, month, 1)
+        return start, add_months(start, 1)
+
+    start = pd.Timestamp(desde) if desde is not None else None
+    end = pd.Timestamp(hasta) + timedelta(days=1) if hasta is not None else None
+    return start, end
+
+
+def _align_tz(value, column):
+    # 'Terminado' is tz-aware when the DynamoDB timestamps carry an offset
+    value = pd.Timestamp(value)
+    tz = column.dt.tz
+    if tz is not None and value.tzinfo is None:
+        return value.tz_localize(tz)
+    if tz is None and value.tzinfo is not None:
+        return value.tz_localize(None)
+    return value
+
+
+def period_mask(df, start=None, end=None, negocio=None):
+    """
+    Boolean mask of the rows of the processed frame that fall in the period and negocio.
+
+    :param df: DataFrame from create_dataframe_from_items, or a slice of it
+    :param start: inclusive lower bound on 'Terminado', or None
+    :param end: exclusive upper bound on 'Terminado', or None
+    :param negocio: str, or None for every negocio
+    :return: boolean Series aligned with df
+    """
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['Terminado'] >= _align_tz(start, df['Terminado'])
+    if end is not None:
+        mask &= df['Terminado'] < _align_tz(end, df['Terminado'])
+    if negocio is not None:
+        mask &= df['negocio'] == negocio
+    return mask
+
+
+def iter_raw_chunks(df, start=None, end=None, negocio=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yields the rows of the processed frame in the period, chunksize source rows at a time,
+    so that only one chunk is ever copied out of df. Always yields at least one (possibly
+    empty) chunk so writers can emit the header.
+    """
+    yielded = False
+    for offset in range(0, len(df), chunksize):
+        chunk = df.iloc[offset:offset + chunksize]
+        chunk = chunk[period_mask(chunk, start, end, negocio)]
+        if not chunk.empty:
+            yielded = True
+            yield chunk
+    if not yielded:
+        yield df.iloc[0:0]
+
+
+def aggregate_by_pv(df, start=None, end=None, negocio=None):
+    """
+    Per-pv aggregates of the 'Progreso' rows in the period, one block per negocio.
+
+    :return: DataFrame with a leading 'negocio' column
+    """
+    frames = []
+    for nego in ([negocio] if negocio is not None else NEGOCIOS):
+        filtered_df = df[period_mask(df, start, end, nego)]
+        if filtered_df.empty:
+            continue
+        aggregated_df = filter_drop_duplicates_groupby_and_aggregate(filtered_df, 'origen', 'Progreso', agg_dict)
+        if aggregated_df.empty:
+            continue
+        aggregated_df.insert(0, 'negocio', nego)
+        frames.append(aggregated_df)
+
+    if not frames:
+        return pd.DataFrame(columns=['negocio', 'pv', 'espesor'] + list(agg_dict))
+    return pd.concat(frames, ignore_index=True)
+
+
+def detailed_analysis(df, espesor_list, costos_mes, start=None, end=None, negocio=None):
+    """
+    "Análisis Detallado" table of the period, one block per negocio and calendar month.
+    Each month is charged costos_mes, so every block matches the dashboard for that month.
+
+    :return: DataFrame with leading 'negocio' and 'mes' columns
+    """
+    frames = []
+    for nego in ([negocio] if negocio is not None else NEGOCIOS):
+        filtered_df = df[period_mask(df, start, end, nego)]
+        if filtered_df.empty:
+            continue
+        for mes, month_df in filtered_df.groupby(filtered_df['Terminado'].dt.strftime('%Y-%m'), sort=True):
+            aggregated_df = filter_drop_duplicates_groupby_and_aggregate(month_df, 'origen', 'Progreso', agg_dict)
+            if aggregated_df.empty or 'perforaTotal' not in aggregated_df.columns:
+                continue
+            result = build_detailed_analysis(aggregated_df, espesor_list, costos_mes)
+            if result.empty:
+                continue
+            result = result.drop(columns=detailed_hidden_columns, errors='ignore')
+            result['espesor_group'] = result['espesor_group'].astype(str)
+            result.insert(0, 'mes', mes)
+            result.insert(0, 'negocio', nego)
+            frames.append(result)
+
+    if not frames:
+        return pd.DataFrame(columns=['negocio', 'mes', 'espesor_group', 'mm_total', 'Perforaciones', 'Costo mm'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_report_chunks(df, report, start=None, end=None, negocio=None, espesor_list=None, costos_mes=0,
+                       chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yields the chunks of the requested report. The raw report streams from df, the
+    aggregated reports are small and come as a single chunk.
+    """
+    if report == 'crudo':
+        yield from iter_raw_chunks(df, start, end, negocio, chunksize)
+    elif report == 'pv':
+        yield aggregate_by_pv(df, start, end, negocio)
+    elif report == 'detalle':
+        if not espesor_list:
+            raise ValueError("El reporte 'detalle' requiere al menos un límite de espesor.")
+        yield detailed_analysis(df, espesor_list, costos_mes, start, end, negocio)
+    else:
+        raise ValueError(f"Reporte desconocido: {report}")
+
+
+def _normalise_chunk(chunk):
+    # DynamoDB numbers arrive as Decimal, which Parquet and Excel do not take in object columns
+    chunk = chunk.copy()
+    for col in chunk.columns:
+        if chunk[col].dtype == object:
+            chunk[col] = chunk[col].apply(lambda x: float(x) if isinstance(x, Decimal) else x)
+    return chunk
+
+
+def _is_path(target):
+    return isinstance(target, (str, os.PathLike))
+
+
+def _write_csv(chunks, target):
+    if _is_path(target):
+        handle = open(target, 'w', encoding='utf-8', newline='')
+    else:
+        handle = io.TextIOWrapper(target, encoding='utf-8', newline='')
+
+    rows = 0
+    try:
+        header = True
+        for chunk in chunks:
+            _normalise_chunk(chunk).to_csv(handle, index=False, header=header)
+            header = False
+            rows += len(chunk)
+    finally:
+        if _is_path(target):
+            handle.close()
+        else:
+            handle.flush()
+            handle.detach()
+    return rows
+
+
+def _write_parquet(chunks, target):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("La exportación a Parquet requiere pyarrow (pip install pyarrow).") from e
+
+    rows = 0
+    schema = None
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(_normalise_chunk(chunk), schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(target, schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _excel_value(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.tz_localize(None).to_pydatetime() if value.tzinfo is not None else value.to_pydatetime()
+    return value
+
+
+def _write_excel(chunks, target, sheet_name='Reporte'):
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise ImportError("La exportación a Excel requiere openpyxl (pip install openpyxl).") from e
+
+    # write_only keeps the rows out of memory until the workbook is saved
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+
+    rows = 0
+    header = True
+    for chunk in chunks:
+        if header:
+            sheet.append([str(col) for col in chunk.columns])
+            header = False
+        if rows + len(chunk) + 1 > EXCEL_MAX_ROWS:
+            raise ValueError("El reporte supera el máximo de filas de Excel; use CSV o Parquet.")
+        for row in _normalise_chunk(chunk).itertuples(index=False, name=None):
+            sheet.append([_excel_value(value) for value in row])
+        rows += len(chunk)
+
+    workbook.save(target)
+    return rows
+
+
+_WRITERS = {
+    'csv': _write_csv,
+    'parquet': _write_parquet,
+    'excel': _write_excel,
+}
+
+
+def write_chunks(chunks, target, fmt):
+    """
+    Writes an iterable of DataFrame chunks with the same columns to target.
+
+    :param chunks: iterable of pandas.DataFrame
+    :param target: file path or binary file object
+    :param fmt: str, one of EXPORT_FORMATS
+    :return: int - number of data rows written
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Formato desconocido: {fmt}")
+    return _WRITERS[fmt](chunks, target)
+
+
+def export_report(df, report, fmt, target, start=None, end=None, negocio=None, espesor_list=None, costos_mes=0,
+                  chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Exports a report of the processed frame for the period to target.
+
+    :return: int - number of data rows written
+    """
+    chunks = iter_report_chunks(df, report, start, end, negocio, espesor_list, costos_mes, chunksize)
+    return write_chunks(chunks, target, fmt)
+
+
+def export_file_name(report, fmt, start=None, end=None, negocio=None):
+    parts = ['cnc', report, negocio or 'todos']
+    if start is None and end is None:
+        parts.append('historial')
+    else:
+        parts.append(pd.Timestamp(start).strftime('%Y%m%d') if start is not None else 'inicio')
+        parts.append((pd.Timestamp(end) - timedelta(days=1)).strftime('%Y%m%d') if end is not None else 'hoy')
+    return '_'.join(parts) + '.' + EXPORT_FORMATS[fmt][0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta los reportes de costos CNC desde DynamoDB.")
+    parser.add_argument('--reporte', choices=list(REPORTS), default='detalle')
+    parser.add_argument('--formato', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--salida', help="Archivo de salida (por defecto se genera un nombre)")
+    parser.add_argument('--anio', type=int, help="Año del período (requiere --mes)")
+    parser.add_argument('--mes', type=int, choices=range(1, 13), metavar='MES',
+                        help="Mes del período, 1 a 12 (requiere --anio)")
+    parser.add_argument('--desde', help="Fecha inicial inclusiva, AAAA-MM-DD")
+    parser.add_argument('--hasta', help="Fecha final inclusiva, AAAA-MM-DD")
+    parser.add_argument('--negocio', choices=NEGOCIOS, help="Por defecto se exportan todos")
+    parser.add_argument('--espesor', default="12, 32", help='Límites de espesor separados por comas')
+    parser.add_argument('--gasto-mes', type=float, default=15000000, help="Gasto mensual, aplicado a cada mes del reporte detalle")
+    parser.add_argument('--tabla', default=DYNAMODB_TABLE)
+    parser.add_argument('--region', default=DYNAMODB_REGION)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    if (args.anio is None) != (args.mes is None):
+        parser.error("--anio y --mes deben indicarse juntos")
+    if args.anio is not None and (args.desde or args.hasta):
+        parser.error("use --anio/--mes o --desde/--hasta, no ambos")
+
+    try:
+        espesor_list = [int(x.strip()) for x in args.espesor.split(',')]
+    except ValueError:
+        parser.error("--espesor debe ser una lista de enteros separados por comas")
+
+    if args.anio is not None and not 1 <= args.anio <= 9999:
+        parser.error("--anio debe estar entre 1 y 9999")
+    for option, value in [('--desde', args.desde), ('--hasta', args.hasta)]:
+        if value is not None:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                parser.error(f"{option} debe ser una fecha válida en formato AAAA-MM-DD")
+
+    start, end = resolve_period(args.anio, args.mes, args.desde, args.hasta)
+    salida = args.salida or export_file_name(args.reporte, args.formato, start, end, args.negocio)
+
+    df = create_dataframe_from_items(scan_dynamodb_table(args.tabla, args.region))
+    rows = export_report(df, args.reporte, args.formato, salida, start, end, args.negocio, espesor_list,
+                         args.gasto_mes, args.chunksize)
+    print(f"{rows} filas exportadas a {salida}")
+
+
+if __name__ == '__main__':
+    main()
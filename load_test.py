@@ -0,0 +1,482 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import warnings
+from decimal import Decimal
+from queue import Empty
+
+import boto3
+import pandas as pd
+
+from export_functions import NEGOCIOS
+from util_functions import *
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+class BackendReads:
+    """
+    Counts the DynamoDB Scan calls, and the items they return, made through the default boto3 session.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scans = 0
+        self.items = 0
+
+    def __call__(self, parsed=None, **kwargs):
+        with self.lock:
+            self.scans += 1
+            self.items += len((parsed or {}).get('Items', []))
+
+    def register(self):
+        boto3.setup_default_session(region_name=DYNAMODB_REGION)
+        boto3.DEFAULT_SESSION.events.register('after-call.dynamodb.Scan', self)
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples the resident memory of the process while the load test runs and keeps the peak.
+    Only meaningful in a fresh process, since CPython keeps the memory freed by earlier rounds.
+    """
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self.stopped = threading.Event()
+
+    def run(self):
+        while self.baseline is not None and not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        if self.baseline is not None:
+            self.peak = max(self.peak, current_rss())
+
+
+def current_rss():
+    """
+    Resident memory of the process in bytes, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def synthetic_items(n_items, since="01/08/2024", seed=0):
+    """
+    Builds items shaped like the MecanizadoClose table, spread over the months since the given date.
+
+    :param n_items: int, number of items
+    :param since: str, first month in dd/mm/YYYY format
+    :param seed: int, seed of the random generator
+    :return: list of items with Decimal numbers, as DynamoDB stores them
+    """
+    rng = random.Random(seed)
+    start = datetime.strptime(since, "%d/%m/%Y")
+    span = max((datetime.now() - start).total_seconds(), 1)
+
+    items = []
+    for i in range(n_items):
+        created_at = start + pd.Timedelta(seconds=rng.uniform(0, span))
+        closed_at = created_at + pd.Timedelta(minutes=rng.randint(30, 2880))
+        progress = [
+            {
+                'createdAt': closed_at.isoformat(),
+                'origen': 'Progreso',
+                'maquina': f'CNC{rng.randint(1, 3)}',
+                'placas': Decimal(rng.randint(1, 6)),
+                'hora_reporte': closed_at.strftime('%H:%M'),
+                'tiempo': Decimal(rng.randint(5, 240)),
+                'tiempo_seteo': Decimal(rng.randint(1, 30)),
+            }
+            for _ in range(rng.randint(1, 4))
+        ]
+        items.append({
+            'pv': f'PV{i:06d}',
+            'timestamp': closed_at.isoformat(),
+            'data': {
+                'createdAt': created_at.isoformat(),
+                'cantidadPerforacionesTotal': Decimal(rng.randint(10, 2000)),
+                'cantidadPerforacionesPlacas': Decimal(rng.randint(1, 400)),
+                'kg': Decimal(str(round(rng.uniform(5, 900), 2))),
+                'tipoMecanizado': rng.choice(['perforado', 'fresado']),
+                'espesor': Decimal(rng.choice([3, 5, 8, 10, 12, 15, 20, 25, 32, 40, 50])),
+                'negocio': rng.choice(NEGOCIOS),
+                'progress': progress,
+            },
+        })
+    return items
+
+
+def seed_table(items, table_name=DYNAMODB_TABLE):
+    """
+    Creates the table on the current DynamoDB endpoint and loads the items. An existing table is left untouched.
+
+    :return: bool - whether the table was created and seeded
+    """
+    dynamo = boto3.resource('dynamodb', region_name=DYNAMODB_REGION)
+    if table_name in dynamo.meta.client.list_tables()['TableNames']:
+        return False
+
+    table = dynamo.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'pv', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'pv', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+        ],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    table.wait_until_exists()
+
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    return True
+
+
+def _widget(widgets, label):
+    widget = next((w for w in widgets if w.label == label), None)
+    if widget is None:
+        raise LookupError(f"No se encontró el widget '{label}'")
+    return widget
+
+
+def change_period(at, rng):
+    for label in ['Mes', 'Año']:
+        widget = _widget(at.selectbox, label)
+        widget.select_index(rng.randrange(len(widget.options)))
+
+
+def change_espesor(at, rng):
+    limits = sorted(rng.sample([5, 8, 10, 12, 15, 20, 25, 32, 40], rng.randint(1, 4)))
+    _widget(at.text_area, 'Límites de Espesor').set_value(', '.join(map(str, limits)))
+
+
+def change_costos(at, rng):
+    _widget(at.number_input, 'Gasto/Mes').set_value(rng.randrange(5000000, 30000001, 500000))
+    _widget(at.number_input, 'Costo/mm').set_value(rng.randrange(80, 321, 10))
+
+
+ACTIONS = [change_period, change_espesor, change_costos]
+
+
+def _failed(at):
+    # main.py reports most failures through st.error instead of raising
+    return bool(at.exception) or bool(at.error)
+
+
+def _timed_run(at):
+    """
+    Runs the script once without letting its failures escape.
+
+    :return: tuple (latency in seconds, outcome) with outcome 'ok', 'error' or 'timeout'
+    """
+    started = time.perf_counter()
+    try:
+        at.run()
+    except Exception as e:
+        latency = time.perf_counter() - started
+        # AppTest signals a run longer than default_timeout with a RuntimeError
+        if isinstance(e, RuntimeError) and 'timed out' in str(e):
+            return latency, 'timeout'
+        return latency, 'error'
+    return time.perf_counter() - started, 'error' if _failed(at) else 'ok'
+
+
+def run_session(session_id, reruns, timeout, think_time, seed):
+    """
+    Drives one dashboard session headlessly: a first run, then one rerun per random sidebar change.
+    A run that times out ends the session, since its script may still be running.
+
+    :return: dict with the latencies of the successful cold run and reruns, the number of failed and
+             timed out runs, the runs skipped after a timeout and the sidebar changes that failed
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + session_id)
+    result = {'cold': None, 'latencies': [], 'errors': 0, 'timeouts': 0, 'skipped': 0, 'action_errors': 0}
+    at = AppTest.from_file(SCRIPT, default_timeout=timeout)
+
+    for rerun in range(reruns + 1):
+        if rerun:
+            if think_time:
+                time.sleep(rng.uniform(0, 2 * think_time))
+            try:
+                rng.choice(ACTIONS)(at, rng)
+            except Exception:
+                # The sidebar may be incomplete after a failed run; rerunning unchanged lets it recover
+                result['action_errors'] += 1
+
+        latency, outcome = _timed_run(at)
+        if outcome == 'timeout':
+            result['timeouts'] += 1
+            result['skipped'] = reruns - rerun
+            break
+        if outcome == 'error':
+            # Failed runs often stop early and would pull the percentiles down
+            result['errors'] += 1
+        elif rerun:
+            result['latencies'].append(latency)
+        else:
+            result['cold'] = latency
+
+    return result
+
+
+def session_worker(session_id, reruns, timeout, think_time, seed, barrier, results):
+    """
+    Entry point of a session process: runs one session and puts its result, with the memory and
+    backend reads of the process, on the results queue.
+    """
+    quiet()
+    os.chdir(os.path.dirname(SCRIPT))
+    try:
+        # Imported before the baseline so the libraries every process loads are not charged to the session
+        import altair
+        import matplotlib
+        import streamlit.testing.v1
+        import export_functions
+
+        reads = BackendReads()
+        reads.register()
+        sampler = MemorySampler()
+        sampler.start()
+        try:
+            # Start the sessions together once every process has finished importing
+            barrier.wait(timeout=300)
+        except threading.BrokenBarrierError:
+            pass
+
+        started = time.time()
+        result = run_session(session_id, reruns, timeout, think_time, seed)
+        result['started'] = started
+        result['finished'] = time.time()
+        sampler.stop()
+        result['memory'] = sampler.peak - sampler.baseline if sampler.baseline is not None else None
+        result['scans'] = reads.scans
+        result['items'] = reads.items
+    except Exception as e:
+        result = {'crashed': repr(e)}
+
+    results.put(result)
+    results.close()
+    results.join_thread()
+    # A script that timed out may still be running in AppTest's thread and would keep the process alive
+    os._exit(0)
+
+
+def run_load_test(sessions, reruns, timeout=120, think_time=0.0, seed=0):
+    """
+    Runs each session in its own process, all at once, and summarizes latency, memory and backend reads.
+    AppTest swaps global runtime state on every run, so sessions can't share a process.
+
+    :param sessions: int, number of simultaneous sessions
+    :param reruns: int, reruns per session after the first run
+    :param timeout: float, seconds allowed for each run
+    :param think_time: float, mean pause in seconds between the reruns of a session
+    :param seed: int, seed of the simulated interactions
+    :return: dict with the report; the latency percentiles only cover successful runs, failed and
+             timed out runs are only counted
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(sessions)
+    queue = context.Queue()
+    processes = [
+        context.Process(target=session_worker, args=(i, reruns, timeout, think_time, seed, barrier, queue),
+                        daemon=True)
+        for i in range(sessions)
+    ]
+    for process in processes:
+        process.start()
+
+    results = []
+    while len(results) < sessions:
+        try:
+            results.append(queue.get(timeout=1))
+        except Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+    crashed = sessions - len(results) + sum(1 for r in results if 'crashed' in r)
+    results = [r for r in results if 'crashed' not in r]
+
+    cold = pd.Series([r['cold'] for r in results if r['cold'] is not None], dtype=float) * 1000
+    latencies = pd.Series([latency for r in results for latency in r['latencies']], dtype=float) * 1000
+    errors = sum(r['errors'] for r in results)
+    timeouts = sum(r['timeouts'] for r in results)
+    runs = len(cold) + len(latencies) + errors + timeouts
+    elapsed = max(r['finished'] for r in results) - min(r['started'] for r in results) if results else 0
+    memory = pd.Series([r['memory'] for r in results if r['memory'] is not None], dtype=float) / 2 ** 20
+    scans = sum(r['scans'] for r in results)
+    items = sum(r['items'] for r in results)
+
+    return {
+        'sessions': sessions,
+        'crashed_sessions': crashed,
+        'runs': runs,
+        'errors': errors,
+        'timeouts': timeouts,
+        'skipped': sum(r['skipped'] for r in results),
+        'action_errors': sum(r['action_errors'] for r in results),
+        'elapsed_s': round(elapsed, 2),
+        'runs_per_s': round(runs / elapsed, 2) if elapsed > 0 else None,
+        'cold_run_ms': _percentiles(cold),
+        'rerun_ms': _percentiles(latencies),
+        'memory_per_session_mb': round(memory.mean(), 2) if not memory.empty else None,
+        'memory_per_session_max_mb': round(memory.max(), 2) if not memory.empty else None,
+        'backend_scans': scans,
+        'backend_items_read': items,
+        'backend_items_per_run': round(items / runs, 1) if runs else None,
+    }
+
+
+def _percentiles(values):
+    if values.empty:
+        return {}
+    return {
+        'p50': round(values.quantile(0.50), 1),
+        'p95': round(values.quantile(0.95), 1),
+        'p99': round(values.quantile(0.99), 1),
+        'max': round(values.max(), 1),
+    }
+
+
+def print_report(report):
+    print(f"Sesiones:                {report['sessions']} ({report['crashed_sessions']} caídas)")
+    print(f"Ejecuciones:             {report['runs']} ({report['errors']} con error, "
+          f"{report['timeouts']} sobre el timeout, {report['skipped']} omitidas tras un timeout)")
+    print(f"Acciones fallidas:       {report['action_errors']}")
+    print(f"Duración:                {report['elapsed_s']} s ({report['runs_per_s']} ejecuciones/s)")
+    for name, key in [('Primera ejecución', 'cold_run_ms'), ('Rerun', 'rerun_ms')]:
+        values = report[key]
+        if values:
+            print(f"{name + ' (ms):':<25}p50 {values['p50']}  p95 {values['p95']}  p99 {values['p99']}  "
+                  f"max {values['max']}")
+    if report['memory_per_session_mb'] is None:
+        print("Memoria:                 no disponible (requiere /proc)")
+    else:
+        print(f"Memoria:                 {report['memory_per_session_mb']} MB/sesión de media, "
+              f"máx {report['memory_per_session_max_mb']} MB")
+    print(f"Lecturas DynamoDB:       {report['backend_scans']} scans, {report['backend_items_read']} items "
+          f"({report['backend_items_per_run']} items/ejecución)")
+
+
+def quiet():
+    # Deprecation warnings (altair's alt.themes among them) and the missing ScriptRunContext
+    # log messages would bury the report
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+    logging.disable(logging.WARNING)
+
+
+def check_endpoint(endpoint_url):
+    """
+    Makes sure boto3 sends DynamoDB calls to endpoint_url. AWS_ENDPOINT_URL_DYNAMODB needs boto3 >= 1.28;
+    older versions ignore it and would scan the real table.
+    """
+    client = boto3.client('dynamodb', region_name=DYNAMODB_REGION)
+    if client.meta.endpoint_url.rstrip('/') != endpoint_url.rstrip('/'):
+        raise RuntimeError(
+            f"boto3 {boto3.__version__} ignora AWS_ENDPOINT_URL_DYNAMODB y usaría {client.meta.endpoint_url}; "
+            "actualice a boto3 >= 1.28"
+        )
+
+
+def start_moto_server():
+    """
+    Starts a moto DynamoDB server on a free local port, reachable from every session process.
+
+    :return: tuple (server, endpoint_url)
+    """
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    return server, f'http://127.0.0.1:{port}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Prueba de carga del dashboard con sesiones simultáneas sobre un DynamoDB local."
+    )
+    parser.add_argument('--sesiones', type=int, nargs='+', default=[1, 5, 10],
+                        help="Número de sesiones simultáneas, cada una en su propio proceso; "
+                             "con varios valores se ejecuta una ronda por valor")
+    parser.add_argument('--reruns', type=int, default=10, help="Cambios en la barra lateral por sesión")
+    parser.add_argument('--items', type=int, default=2000, help="Items sintéticos en la tabla")
+    parser.add_argument('--pausa', type=float, default=0.0, help="Pausa media entre reruns, en segundos")
+    parser.add_argument('--timeout', type=float, default=120, help="Tiempo máximo por ejecución, en segundos")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--endpoint-url',
+                        help="DynamoDB Local ya levantado (p. ej. http://localhost:8000); por defecto se usa un "
+                             "servidor moto")
+    parser.add_argument('--json', help="Archivo donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    quiet()
+    # main.py loads data/logo.png relative to the working directory
+    os.chdir(os.path.dirname(SCRIPT))
+    # Dummy credentials, so nothing can reach a real account; the session processes inherit the environment
+    for key in ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY']:
+        os.environ[key] = 'testing'
+    for key in ['AWS_SESSION_TOKEN', 'AWS_PROFILE']:
+        os.environ.pop(key, None)
+    os.environ['AWS_DEFAULT_REGION'] = DYNAMODB_REGION
+
+    server = None
+    if args.endpoint_url:
+        endpoint_url = args.endpoint_url
+    else:
+        try:
+            server, endpoint_url = start_moto_server()
+        except ImportError:
+            parser.error("moto no está instalado (pip install 'moto[server]'); use --endpoint-url con DynamoDB Local")
+
+    try:
+        # Picked up by every boto3 client, including the one in scan_dynamodb_table
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = endpoint_url
+        check_endpoint(endpoint_url)
+        if not seed_table(synthetic_items(args.items, seed=args.semilla)):
+            print(f"La tabla {DYNAMODB_TABLE} ya existe; se usan sus datos.\n")
+
+        reports = []
+        for sessions in args.sesiones:
+            report = run_load_test(sessions, args.reruns, args.timeout, args.pausa, args.semilla)
+            print_report(report)
+            print()
+            reports.append(report)
+
+            if args.json:
+                with open(args.json, 'w') as f:
+                    json.dump(reports, f, indent=2)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
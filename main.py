@@ -3,7 +3,10 @@ import streamlit as st
 import altair as alt
 import pandas as pd
 from util_functions import *
+from export_functions import EXPORT_FORMATS, NEGOCIOS, REPORTS, export_file_name, export_report, resolve_period
 import re
+import tempfile
+from datetime import datetime
 from decimal import Decimal
 
 # Streamlit Configuration
@@ -44,17 +47,8 @@ st.markdown("""
 
 # DynamoDB Setup and Data Retrieval
 try:
-    dynamo = boto3.resource('dynamodb', region_name='us-east-1')
-    table = dynamo.Table("sam-stack-irlaa-MecanizadoCloseTable-1IKYW80FKFRII")
-    
-    items = []
-    response = table.scan()
-    items.extend(response['Items'])
-    
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-        items.extend(response['Items'])
-        
+    items = scan_dynamodb_table()
+
     # st.sidebar.success(f"Retrieved {len(items)} records from DynamoDB")
 except Exception as e:
     st.error(f"Error connecting to DynamoDB: {str(e)}")
@@ -199,18 +193,6 @@ def show_no_data_message(title, month, year):
         </div>
     """, unsafe_allow_html=True)
 
-# Aggregation Configuration
-agg_dict = {
-    'cantidadPerforacionesTotal': 'sum',
-    'cantidadPerforacionesPlacas': 'sum',
-    'perforaTotal': 'sum',
-    'kg': 'mean',
-    'placas': 'sum',
-    'tiempo': 'mean',
-    'tiempo_seteo': 'mean',
-    'Tiempo Proceso (min)': 'sum'
-}
-
 def render_section(title, aggregated_df, espesor_list, pr, costos_mes):
     # Enhanced CSS with modern design and animations
     st.markdown("""
@@ -315,12 +297,10 @@ def render_section(title, aggregated_df, espesor_list, pr, costos_mes):
 
     try:
         avg_espesor = round(float(weighted_average_espesor(aggregated_df)), 2)
-        result = group_by_espesor(aggregated_df, espesor_list)
         perforaciones = float(sum(aggregated_df['perforaTotal']))
         
         if perforaciones > 0:
-            result['Costo mm'] = round(((result['perforaTotal'] / perforaciones) * costos_mes) / (result['mm_total']), 2)
-            result['Costo mm'] = result['Costo mm'].fillna(0)
+            result = build_detailed_analysis(aggregated_df, espesor_list, costos_mes)
 
             mm_total = round(float(result['mm_total'].sum()), 2)
             costo_mm = round(costos_mes * (pr / mm_total), 2) if mm_total > 0 else 0
@@ -377,13 +357,7 @@ def render_section(title, aggregated_df, espesor_list, pr, costos_mes):
 
             # Enhanced Table Display
             st.markdown("### Análisis Detallado")
-            display_result = result.copy()
-            if 'perforaTotal' in display_result.columns:
-                display_result = display_result.drop(columns=['perforaTotal'])
-            if 'placas' in display_result.columns:
-                display_result = display_result.drop(columns=['placas'])
-            if 'Tiempo Proceso (min)' in display_result.columns:
-                display_result = display_result.drop(columns=['Tiempo Proceso (min)'])
+            display_result = result.drop(columns=detailed_hidden_columns, errors='ignore')
 
             # Style the dataframe
             st.markdown('<div class="styled-table">', unsafe_allow_html=True)
@@ -406,9 +380,59 @@ def render_section(title, aggregated_df, espesor_list, pr, costos_mes):
         st.exception(e)
 
 
+def render_export_section(df):
+    with st.sidebar:
+        st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+        st.markdown('<p class="sidebar-header">📤 Exportar</p>', unsafe_allow_html=True)
+        # A failing export must not take down the Sabimet and Steelk sections
+        try:
+            render_export_controls(df)
+        except Exception as e:
+            st.error(f"Error al exportar: {str(e)}")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+def render_export_controls(df):
+    report = st.selectbox('Reporte', list(REPORTS), format_func=REPORTS.get)
+    alcance = st.radio('Alcance', ['Período seleccionado', 'Rango de fechas', 'Historial completo'])
+    if alcance == 'Período seleccionado':
+        start, end = resolve_period(selected_year, selected_month)
+    elif alcance == 'Rango de fechas':
+        dates = st.date_input('Fechas', value=(datetime(2024, 8, 1), datetime.now()))
+        if len(dates) == 0:
+            st.info("Seleccione una fecha inicial para exportar.")
+            return
+        if len(dates) == 2:
+            start, end = resolve_period(desde=dates[0], hasta=dates[1])
+        else:
+            start, end = resolve_period(desde=dates[0])
+    else:
+        start, end = resolve_period()
+
+    negocio = st.selectbox('Negocio', [None] + NEGOCIOS, format_func=lambda x: 'Todos' if x is None else x.capitalize())
+    fmt = st.selectbox('Formato', list(EXPORT_FORMATS), format_func=str.upper)
+
+    def build_export_file():
+        # Anonymous temporary file: the OS removes it once Streamlit has read and closed it
+        f = tempfile.TemporaryFile()
+        export_report(df, report, fmt, f, start, end, negocio, espesor_list, costos_mes)
+        f.seek(0)
+        return f
+
+    # The file is only generated when the user clicks, not on every rerun of the dashboard
+    st.download_button(
+        'Descargar exportación',
+        data=build_export_file,
+        file_name=export_file_name(report, fmt, start, end, negocio),
+        mime=EXPORT_FORMATS[fmt][1],
+        on_click='ignore',
+        use_container_width=True
+    )
+
 # Main Data Processing
 try:
     df = create_dataframe_from_items(items)
+    render_export_section(df)
 
     # Filter data
     filtered_df_sabimet = filter_by_year_month(df, selected_year, selected_month, 'sabimet')
@@ -1,3 +1,4 @@
+import boto3
 import pandas as pd
 from typing import List, Dict, Any
 from decimal import Decimal
@@ -6,6 +7,47 @@ from decimal import Decimal
 from datetime import datetime
 
 
+DYNAMODB_TABLE = "sam-stack-irlaa-MecanizadoCloseTable-1IKYW80FKFRII"
+DYNAMODB_REGION = 'us-east-1'
+
+# Aggregation Configuration
+agg_dict = {
+    'cantidadPerforacionesTotal': 'sum',
+    'cantidadPerforacionesPlacas': 'sum',
+    'perforaTotal': 'sum',
+    'kg': 'mean',
+    'placas': 'sum',
+    'tiempo': 'mean',
+    'tiempo_seteo': 'mean',
+    'Tiempo Proceso (min)': 'sum'
+}
+
+# Columns of the espesor analysis that are not shown in "Análisis Detallado"
+detailed_hidden_columns = ['perforaTotal', 'placas', 'Tiempo Proceso (min)']
+
+
+def scan_dynamodb_table(table_name=DYNAMODB_TABLE, region_name=DYNAMODB_REGION):
+    """
+    Reads every item of a DynamoDB table, following the scan pagination.
+
+    :param table_name: str, name of the DynamoDB table
+    :param region_name: str, AWS region of the table
+    :return: list of items
+    """
+    dynamo = boto3.resource('dynamodb', region_name=region_name)
+    table = dynamo.Table(table_name)
+
+    items = []
+    response = table.scan()
+    items.extend(response['Items'])
+
+    while 'LastEvaluatedKey' in response:
+        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+        items.extend(response['Items'])
+
+    return items
+
+
 def get_months_and_years_since(date_str):
     initial_date = datetime.strptime(date_str, "%d/%m/%Y")
     current_date = datetime.now()
@@ -202,3 +244,27 @@ def group_by_espesor(df, espesor_list):
     grouped_df = grouped_df.drop(columns=['espesor', 'cantidadPerforacionesPlacas', 'cantidadPerforacionesTotal'])
 
     return  grouped_df
+
+
+def build_detailed_analysis(aggregated_df, espesor_list, costos_mes):
+    """
+    Groups the per-pv aggregates by espesor and computes the cost per mm of each group,
+    as shown in the "Análisis Detallado" table.
+
+    Parameters:
+    - aggregated_df: pandas.DataFrame, output of filter_drop_duplicates_groupby_and_aggregate
+    - espesor_list: list of int, espesor limits
+    - costos_mes: float, total expense assigned to the data
+
+    Returns:
+    - pandas.DataFrame with one row per espesor group, or an empty DataFrame if there are no perforaciones
+    """
+    perforaciones = float(sum(aggregated_df['perforaTotal']))
+    if perforaciones <= 0:
+        return pd.DataFrame()
+
+    result = group_by_espesor(aggregated_df, espesor_list)
+    result['Costo mm'] = round(((result['perforaTotal'] / perforaciones) * costos_mes) / (result['mm_total']), 2)
+    result['Costo mm'] = result['Costo mm'].fillna(0)
+
+    return result